@@ -332,12 +332,13 @@ class PatchCreator(data.Dataset):
             target_src_shape = target_src.shape
             target_patch_shape = self.target_patch_shape
 
-        M = coord_transforms.get_warped_coord_transform(
+        M, M_inv = coord_transforms.get_warped_coord_transform(
             inp_src_shape=inp_src.shape,
             patch_shape=self.patch_shape,
             aniso_factor=self.aniso_factor,
             target_src_shape=target_src_shape,
             target_patch_shape=target_patch_shape,
+            return_inverse=True,
             **warp_kwargs
         )
 
@@ -347,7 +348,10 @@ class PatchCreator(data.Dataset):
             M=M,
             target_src=target_src,
             target_patch_shape=target_patch_shape,
-            target_discrete_ix=self.target_discrete_ix
+            target_discrete_ix=self.target_discrete_ix,
+            M_inv=M_inv,
+            # Only random perspective warping makes M projective
+            is_projective=do_warp and warp_kwargs.get('perspective', False)
         )
 
         return inp, target
@@ -6,7 +6,8 @@
 
 __all__ = ['warp_slice', 'get_warped_coord_transform', 'WarpingOOBError']
 
-import itertools
+import math
+import threading
 from typing import Tuple, Union, Optional, Sequence
 from functools import reduce, lru_cache
 import numpy as np
@@ -15,6 +16,11 @@ from scipy.ndimage import gaussian_filter
 from elektronn3 import floatX
 from elektronn3.data.sources import DataSource, slice_3d
 
+try:
+    import cv2
+except ImportError:  # OpenCV is optional. It only speeds up interpolation (see _slicewise_src_z()).
+    cv2 = None
+
 # TODO: A major refactoring is required here:
 #  This module should not perform any data I/O itself. Instead it should provide a
 #  framework for generating and transforming source coordinates (with
@@ -23,9 +29,32 @@ from elektronn3.data.sources import DataSource, slice_3d
 
 numba.config.THREADING_LAYER = 'tbb'
 
+# Patches with fewer voxels than this are interpolated with the serial twins of
+#  the map_coordinates_* gufuncs because for small arrays, the overhead of
+#  dispatching work to multiple threads outweighs the parallel speedup.
+PARALLEL_MIN_VOXELS = 32 ** 3
+
+
+def _guvectorize_twins(signatures, layout):
+    """Compiles a gufunc kernel twice: once multithreaded
+    (``target='parallel'``) and once serial.
+
+    Returns a decorator that produces a ``(parallel, serial)`` tuple."""
+    def decorator(kernel):
+        parallel = numba.guvectorize(
+            signatures, layout, nopython=True, target='parallel', fastmath=True
+        )(kernel)
+        serial = numba.guvectorize(
+            signatures, layout, nopython=True, fastmath=True
+        )(kernel)
+        return parallel, serial
+    return decorator
+
 
+# Not used by warp_slice() anymore (see map_coordinates_mixed), so only a
+#  single serial version is compiled.
 @numba.guvectorize(['void(float32[:,:,:], float32[:], float32[:], float32[:,],)'],
-              '(x,y,z),(i),(i)->()', nopython=True)#target='parallel',
+              '(x,y,z),(i),(i)->()', nopython=True, fastmath=True)
 def map_coordinates_nearest(src, coords, lo, dest):
     """Generalized ufunc that performs nearest-neighbor interpolation,
     given a floating point coordinate array expressed by ``coords - lo``.
@@ -40,10 +69,14 @@ def map_coordinates_nearest(src, coords, lo, dest):
     Always make sure that every coodinate in ``coords - lo`` actually *has* a
     nearest neighbor inside the bounds of ``src``.
     Otherwise, ``dest`` will be filled with garbage values from uninitialized
-    memory or will cause a segmentation fault."""
-    u = np.int32(np.round(coords[0] - lo[0]))
-    v = np.int32(np.round(coords[1] - lo[1]))
-    w = np.int32(np.round(coords[2] - lo[2]))
+    memory or will cause a segmentation fault.
+
+    Since valid coordinates ``coords - lo`` are never negative, rounding is
+    implemented as ``floor(x + 0.5)`` (rounding halves up), which is cheaper
+    than ``np.round()`` (which rounds halves to even)."""
+    u = np.int32(math.floor(coords[0] - lo[0] + np.float32(0.5)))
+    v = np.int32(math.floor(coords[1] - lo[1] + np.float32(0.5)))
+    w = np.int32(math.floor(coords[2] - lo[2] + np.float32(0.5)))
     dest[0] = src[u,v,w]
 
 
@@ -54,18 +87,24 @@ def _loop_map_coordinates_nearest(src, coords, lo, dest):
     for z in range(coords.shape[0]):
         for y in range(coords.shape[1]):
             for x in range(coords.shape[2]):
-                u = np.int32(np.round(coords[z, y, x, 0] - lo[0]))
-                v = np.int32(np.round(coords[z, y, x, 1] - lo[1]))
-                w = np.int32(np.round(coords[z, y, x, 2] - lo[2]))
+                u = np.int32(math.floor(coords[z, y, x, 0] - lo[0] + np.float32(0.5)))
+                v = np.int32(math.floor(coords[z, y, x, 1] - lo[1] + np.float32(0.5)))
+                w = np.int32(math.floor(coords[z, y, x, 2] - lo[2] + np.float32(0.5)))
                 dest[z, y, x] = src[u,v,w]
 
 
-@numba.guvectorize(['void(float32[:,:,:], float32[:], float32[:], float32[:,],)'],
-              '(x,y,z),(i),(i)->()', nopython=True)# target='parallel'
-def map_coordinates_linear(src, coords, lo, dest):
+@_guvectorize_twins(['void(float32[:,:,:,:], float32[:], float32[:], float32[:],)'],
+                    '(c,x,y,z),(i),(i)->(c)')
+def _map_coordinates_linear(src, coords, lo, dest):
     """Generalized ufunc that performs trilinear interpolation,
     given a floating point coordinate array expressed by ``coords - lo``.
 
+    All channels of ``src`` (first axis) are interpolated at once, so the
+    interpolation weights only have to be computed once per coordinate.
+    The channel axis of ``dest`` is the last axis, so in order to write
+    to a channel-first array ``out`` of shape ``(C, D, H, W)``, pass
+    ``out.transpose(1, 2, 3, 0)`` as ``dest``.
+
     We don't pass ``coords - lo`` directly as an argument because we want to
     compute it inside the gufunc for performance reasons (the simple subtraction
     ``coords - lo`` in normal numpy code actually takes longer than executing
@@ -89,15 +128,79 @@ def map_coordinates_linear(src, coords, lo, dest):
     w0 = np.int32(w)
     w1 = w0 + 1
     dw = w - w0
-    val = src[u0, v0, w0] * (1-du) * (1-dv) * (1-dw) +\
-          src[u1, v0, w0] * du * (1-dv) * (1-dw) +\
-          src[u0, v1, w0] * (1-du) * dv * (1-dw) +\
-          src[u0, v0, w1] * (1-du) * (1-dv) * dw +\
-          src[u1, v0, w1] * du * (1-dv) * dw +\
-          src[u0, v1, w1] * (1-du) * dv * dw +\
-          src[u1, v1, w0] * du * dv * (1-dw) +\
-          src[u1, v1, w1] * du * dv * dw
-    dest[0] = val
+    w000 = (1-du) * (1-dv) * (1-dw)
+    w100 = du * (1-dv) * (1-dw)
+    w010 = (1-du) * dv * (1-dw)
+    w001 = (1-du) * (1-dv) * dw
+    w101 = du * (1-dv) * dw
+    w011 = (1-du) * dv * dw
+    w110 = du * dv * (1-dw)
+    w111 = du * dv * dw
+    for c in range(src.shape[0]):
+        dest[c] = src[c, u0, v0, w0] * w000 +\
+                  src[c, u1, v0, w0] * w100 +\
+                  src[c, u0, v1, w0] * w010 +\
+                  src[c, u0, v0, w1] * w001 +\
+                  src[c, u1, v0, w1] * w101 +\
+                  src[c, u0, v1, w1] * w011 +\
+                  src[c, u1, v1, w0] * w110 +\
+                  src[c, u1, v1, w1] * w111
+
+
+map_coordinates_linear, _map_coordinates_linear_serial = _map_coordinates_linear
+
+
+@_guvectorize_twins(['void(float32[:,:,:,:], float32[:], float32[:], boolean[:], float32[:],)'],
+                    '(c,x,y,z),(i),(i),(c)->(c)')
+def _map_coordinates_mixed(src, coords, lo, discrete, dest):
+    """Generalized ufunc that interpolates all channels of ``src`` at once,
+    using nearest-neighbor interpolation for channels where ``discrete`` is
+    ``True`` and trilinear interpolation for all other channels.
+
+    The semantics and the bounds requirements of each channel are the same as
+    in map_coordinates_nearest() and map_coordinates_linear(), respectively.
+    Like in map_coordinates_linear(), the channel axis of ``dest`` is the
+    last axis."""
+    u = coords[0] - lo[0]
+    v = coords[1] - lo[1]
+    w = coords[2] - lo[2]
+    # Nearest neighbor (see map_coordinates_nearest() for the rounding)
+    un = np.int32(math.floor(u + np.float32(0.5)))
+    vn = np.int32(math.floor(v + np.float32(0.5)))
+    wn = np.int32(math.floor(w + np.float32(0.5)))
+    # Trilinear
+    u0 = np.int32(u)
+    u1 = u0 + 1
+    du = u - u0
+    v0 = np.int32(v)
+    v1 = v0 + 1
+    dv = v - v0
+    w0 = np.int32(w)
+    w1 = w0 + 1
+    dw = w - w0
+    w000 = (1-du) * (1-dv) * (1-dw)
+    w100 = du * (1-dv) * (1-dw)
+    w010 = (1-du) * dv * (1-dw)
+    w001 = (1-du) * (1-dv) * dw
+    w101 = du * (1-dv) * dw
+    w011 = (1-du) * dv * dw
+    w110 = du * dv * (1-dw)
+    w111 = du * dv * dw
+    for c in range(src.shape[0]):
+        if discrete[c]:
+            dest[c] = src[c, un, vn, wn]
+        else:
+            dest[c] = src[c, u0, v0, w0] * w000 +\
+                      src[c, u1, v0, w0] * w100 +\
+                      src[c, u0, v1, w0] * w010 +\
+                      src[c, u0, v0, w1] * w001 +\
+                      src[c, u1, v0, w1] * w101 +\
+                      src[c, u0, v1, w1] * w011 +\
+                      src[c, u1, v1, w0] * w110 +\
+                      src[c, u1, v1, w1] * w111
+
+
+map_coordinates_mixed, _map_coordinates_mixed_serial = _map_coordinates_mixed
 
 
 @numba.jit(nopython=True)
@@ -119,15 +222,16 @@ def _loop_map_coordinates_linear(src, coords, lo, dest):
                 w0 = np.int32(w)
                 w1 = w0 + 1
                 dw = w - w0
-                val = src[u0, v0, w0] * (1-du) * (1-dv) * (1-dw) +\
-                      src[u1, v0, w0] * du * (1-dv) * (1-dw) +\
-                      src[u0, v1, w0] * (1-du) * dv * (1-dw) +\
-                      src[u0, v0, w1] * (1-du) * (1-dv) * dw +\
-                      src[u1, v0, w1] * du * (1-dv) * dw +\
-                      src[u0, v1, w1] * (1-du) * dv * dw +\
-                      src[u1, v1, w0] * du * dv * (1-dw) +\
-                      src[u1, v1, w1] * du * dv * dw
-                dest[z, y, x] = val
+                for c in range(src.shape[0]):
+                    val = src[c, u0, v0, w0] * (1-du) * (1-dv) * (1-dw) +\
+                          src[c, u1, v0, w0] * du * (1-dv) * (1-dw) +\
+                          src[c, u0, v1, w0] * (1-du) * dv * (1-dw) +\
+                          src[c, u0, v0, w1] * (1-du) * (1-dv) * dw +\
+                          src[c, u1, v0, w1] * du * (1-dv) * dw +\
+                          src[c, u0, v1, w1] * (1-du) * dv * dw +\
+                          src[c, u1, v1, w0] * du * dv * (1-dw) +\
+                          src[c, u1, v1, w1] * du * dv * dw
+                    dest[z, y, x, c] = val
 
 
 @lru_cache(maxsize=1)
@@ -135,63 +239,108 @@ def identity():
     return np.eye(4, dtype=floatX)
 
 
+# The matrix factories below are called several times per sample, so they are
+#  compiled by numba (eagerly, with on-disk caching) to avoid the overhead of
+#  building small arrays from nested lists in Python.
+
+@numba.njit('float32[:, ::1](float64, float64, float64)', cache=True)
 def translate(dz, dy, dx):
-    return np.array([
-        [1.0, 0.0, 0.0,  dz],
-        [0.0, 1.0, 0.0,  dy],
-        [0.0, 0.0, 1.0,  dx],
-        [0.0, 0.0, 0.0, 1.0]
-    ], dtype=floatX)
+    m = np.eye(4, dtype=floatX)
+    m[0, 3] = dz
+    m[1, 3] = dy
+    m[2, 3] = dx
+    return m
 
 
+@numba.njit('float32[:, ::1](float64)', cache=True)
 def rotate_z(a):
-    return np.array([
-        [1.0, 0.0,    0.0,     0.0],
-        [0.0, np.cos(a), -np.sin(a), 0.0],
-        [0.0, np.sin(a), np.cos(a),  0.0],
-        [0.0, 0.0,    0.0,     1.0]
-    ], dtype=floatX)
+    m = np.eye(4, dtype=floatX)
+    c, s = np.cos(a), np.sin(a)
+    m[1, 1] = c
+    m[1, 2] = -s
+    m[2, 1] = s
+    m[2, 2] = c
+    return m
 
 
+@numba.njit('float32[:, ::1](float64)', cache=True)
 def rotate_y(a):
-    return np.array([
-        [np.cos(a), -np.sin(a), 0.0, 0.0],
-        [np.sin(a),  np.cos(a), 0.0, 0.0],
-        [0.0,        0.0, 1.0, 0.0],
-        [0.0,        0.0, 0.0, 1.0]
-    ], dtype=floatX)
+    m = np.eye(4, dtype=floatX)
+    c, s = np.cos(a), np.sin(a)
+    m[0, 0] = c
+    m[0, 1] = -s
+    m[1, 0] = s
+    m[1, 1] = c
+    return m
 
 
+@numba.njit('float32[:, ::1](float64)', cache=True)
 def rotate_x(a):
-    return np.array([
-        [np.cos(a),  0.0, np.sin(a), 0.0],
-        [0.0,     1.0, 0.0,    0.0],
-        [-np.sin(a), 0.0, np.cos(a), 0.0],
-        [0.0,     0.0, 0.0,    1.0]
-    ], dtype=floatX)
+    m = np.eye(4, dtype=floatX)
+    c, s = np.cos(a), np.sin(a)
+    m[0, 0] = c
+    m[0, 2] = s
+    m[2, 0] = -s
+    m[2, 2] = c
+    return m
 
 
+@lru_cache()
+@numba.njit('float32[:, ::1](float64, float64, float64)', cache=True)
 def scale_inv(mz, my, mx):
-    return np.array([
-        [1/mz,  0.0,    0.0,  0.0],
-        [0.0,   1/my,   0.0,  0.0],
-        [0.0,   0.0,    1/mx, 0.0],
-        [0.0,   0.0,    0.0,  1.0]
-    ], dtype=floatX)
+    m = np.eye(4, dtype=floatX)
+    m[0, 0] = 1 / mz
+    m[1, 1] = 1 / my
+    m[2, 2] = 1 / mx
+    return m
 
 
 @lru_cache()
+@numba.njit('float32[:, ::1](float64, float64, float64)', cache=True)
 def scale(mz, my, mx):
-    return np.array([
-        [mz,  0.0, 0.0, 0.0],
-        [0.0, my,  0.0, 0.0],
-        [0.0, 0.0, mx,  0.0],
-        [0.0, 0.0, 0.0, 1.0]
-    ], dtype=floatX)
+    m = np.eye(4, dtype=floatX)
+    m[0, 0] = mz
+    m[1, 1] = my
+    m[2, 2] = mx
+    return m
+
+
+@lru_cache(maxsize=1024)
+def _inv4x4(mb):
+    """Inverts a 4x4 matrix that is given by its raw ``float64`` bytes
+    (``M.astype(np.float64).tobytes()``), so results can be cached.
+
+    Many transforms are repeated during training (e.g. the identity
+    warping matrix if ``warp_amount == 0``), so this often avoids the
+    actual inversion. The returned array is shared and therefore read-only."""
+    M = np.frombuffer(mb, dtype=np.float64).reshape(4, 4)  # float64 for stability...
+    M_inv = np.linalg.inv(M).astype(floatX)
+    M_inv.setflags(write=False)
+    return M_inv
 
 
 def chain_matrices(mat_list):
-    return reduce(np.dot, mat_list, identity())
+    if len(mat_list) == 0:
+        return identity()
+    return reduce(np.matmul, mat_list)
+
+
+@lru_cache()
+def _dest_transform(dest_center, aniso_factor, sample_aniso):
+    """Returns the constant left-hand part ``T_dest @ S_dest`` of the
+    coordinate transform chain and its inverse.
+
+    It only depends on the patch shape and the anisotropy settings, which
+    usually don't change between calls, so it is cached.
+    ``dest_center`` has to be passed as a tuple to make it hashable."""
+    T_dest = translate(*dest_center)
+    T_dest_inv = translate(*(-c for c in dest_center))
+    if sample_aniso:
+        S_dest = scale(1.0 / aniso_factor, 1, 1)
+        S_dest_inv = scale(aniso_factor, 1, 1)
+    else:
+        S_dest = S_dest_inv = identity()
+    return T_dest @ S_dest, S_dest_inv @ T_dest_inv
 
 
 def get_random_rotmat(lock_z=False, amount=1.0):
@@ -209,50 +358,74 @@ def get_random_rotmat(lock_z=False, amount=1.0):
     return R
 
 
-def get_random_flipmat(no_x_flip=False):
-    F = np.eye(4, dtype=floatX)
-    flips = np.random.binomial(1, 0.5, 4) * 2 - 1
-    flips[3] = 1 # don't flip homogeneous dimension
+def get_random_flips(no_x_flip=False):
+    """Random axis flips, expressed as signs (1 or -1) of the (z, y, x) axes"""
+    flips = (np.random.binomial(1, 0.5, 3) * 2 - 1).astype(np.int8)
     if no_x_flip:
         flips[2] = 1
-
-    np.fill_diagonal(F, flips)
-    return F
+    return flips
 
 
-def get_random_swapmat(lock_z=False):
-    S = np.eye(4, dtype=floatX)
+def get_random_swap(lock_z=False):
+    """Random axis swap, expressed as a permutation of the (z, y, x) axes"""
     if lock_z:
-        swaps = [[0, 1, 2, 3],
-                 [0, 2, 1, 3]]
+        swaps = [[0, 1, 2],
+                 [0, 2, 1]]
     else:
-        swaps = [[0, 1, 2, 3],
-                 [0, 2, 1, 3],
-                 [1, 0, 2, 3],
-                 [1, 2, 0, 3],
-                 [2, 0, 1, 3],
-                 [2, 1, 0, 3]]
+        swaps = [[0, 1, 2],
+                 [0, 2, 1],
+                 [1, 0, 2],
+                 [1, 2, 0],
+                 [2, 0, 1],
+                 [2, 1, 0]]
 
     i = np.random.randint(0, len(swaps))
-    S = S[swaps[i]]
+    return np.array(swaps[i], dtype=np.int8)
+
+
+def get_random_flipmat(no_x_flip=False):
+    F = np.eye(4, dtype=floatX)
+    F[:3, :3] *= get_random_flips(no_x_flip)
+    return F
+
+
+def get_random_swapmat(lock_z=False):
+    S = np.eye(4, dtype=floatX)
+    S[:3] = S[get_random_swap(lock_z)]
     return S
 
 
+def flip_swap(X, flips, perm):
+    """Computes ``F @ S @ X``, where ``F`` is the flip matrix expressed by
+    ``flips`` and ``S`` is the swap matrix expressed by ``perm``.
+
+    This only requires negating and permuting the rows of ``X``, which is
+    much cheaper than actual matrix multiplications."""
+    Y = X.copy()
+    Y[:3] = X[perm] * flips[:, None]
+    return Y
+
+
+def flip_swap_inv(X, flips, perm):
+    """Computes ``(F @ S)^-1 @ X = S.T @ F @ X`` (see ``flip_swap()``)."""
+    Y = X.copy()
+    Y[perm] = X[:3] * flips[:, None]
+    return Y
+
+
 def get_random_warpmat(lock_z=False, perspective=False, amount=1.0):
     W = np.eye(4, dtype=floatX)
     amount *= 0.1
-    perturb = np.random.uniform(-amount, amount, (4, 4))
-    perturb[3,3] = 0
-    if lock_z:
-        perturb[0] = 0
-        perturb[:,0] = 0
-    if not perspective:
-        perturb[3] = 0
-
-    perturb[3,:3] *= 0.05 # perspective parameters need to be very small
-    np.clip(perturb[3,:3], -3e-3, 3e-3, out=perturb[3,:3])
+    # Only sample the entries that are actually perturbed.
+    # With lock_z, the z row and column are not warped.
+    a0 = 1 if lock_z else 0
+    W[a0:3, a0:] += np.random.uniform(-amount, amount, (3 - a0, 4 - a0))
+    if perspective:
+        persp = np.random.uniform(-amount, amount, 3 - a0)
+        persp *= 0.05 # perspective parameters need to be very small
+        W[3, a0:3] = np.clip(persp, -3e-3, 3e-3)
 
-    return W + perturb
+    return W
 
 
 @lru_cache()
@@ -267,18 +440,75 @@ def make_dest_coords(sh):
     return coords.astype(floatX)
 
 
+@lru_cache()
+def make_dest_coords_3d(sh):
+    """
+    Make non-homogeneous coordinate array of shape (3,) + sh for destination
+    array of shape sh (coordinate axis first)
+    """
+    return np.mgrid[0:sh[0], 0:sh[1], 0:sh[2]].astype(floatX)
+
+
 @lru_cache()
 def make_dest_corners(sh):
     """
     Make coordinate list of the corners of destination array of shape sh
     """
-    corners = list(itertools.product(*([0,1],)*3))
-    sh = np.subtract(sh, 1) # 0-based indices
-    corners = np.multiply(sh, corners)
-    corners = np.hstack((corners, np.ones((8,1)))) # homogeneous coords
+    # The bits of 0..7 enumerate all corners (in itertools.product() order)
+    bits = (np.arange(8)[:, None] >> np.arange(2, -1, -1)) & 1
+    corners = np.ones((8, 4), dtype=floatX) # homogeneous coords
+    corners[:, :3] = bits * np.subtract(sh, 1) # 0-based indices
     return corners
 
 
+def _slicewise_src_z(M_inv, src_coords, lo, tol=1e-3):
+    """Checks if the (non-projective) inverse transform ``M_inv`` maps each
+    ``z`` plane of the destination patch to exactly one ``z`` plane of the
+    source, which is the case for transforms that don't rotate or warp the
+    ``z`` axis into the other axes (e.g. with ``lock_z=True``).
+
+    If so, the source ``z`` indices (relative to ``lo``) of all destination
+    planes are returned, so each plane can be interpolated by a 2D remapping.
+    Otherwise, ``None`` is returned.
+
+    Note that the result of the 2D remapping depends on the installed OpenCV
+    version: OpenCV 5 matches the 3D numba interpolation up to float32
+    rounding, but older versions (4.x) round the sampling coordinates to
+    1/32 voxel internally, so interpolated values may differ slightly from
+    those obtained without OpenCV.
+
+    ``tol`` is the maximum tolerated deviation (in voxels) of a source ``z``
+    coordinate from its plane anywhere in the patch, so the in-plane
+    dependence of ``z`` is scaled by the patch extent."""
+    extent = np.array(src_coords.shape[1:3]) - 1
+    if np.any(np.abs(M_inv[0, 1:3]) * extent > tol):
+        return None
+    # Source z is affine within each plane, so if it is integral at all four
+    #  in-plane corners, it is integral (and constant) everywhere in the plane.
+    corners_z = src_coords[:, [0, 0, -1, -1], [0, -1, 0, -1], 0] - lo[0]
+    src_z_int = np.round(corners_z[:, 0])
+    if np.any(np.abs(corners_z - src_z_int[:, None]) > tol):
+        return None
+    return src_z_int.astype(np.int64)
+
+
+# Thread-local buffers that source data is read into in warp_slice(), so
+#  the memory doesn't have to be re-allocated for each patch.
+_read_buffers = threading.local()
+
+
+def _read_buffer(key, shape):
+    """Returns a C-contiguous ``floatX`` array of the given shape that
+    reuses a thread-local buffer. Its content is only valid until the next
+    call with the same ``key`` in the same thread."""
+    size = int(np.prod(shape))
+    buf = getattr(_read_buffers, key, None)
+    if buf is None or buf.size < size:
+        buf = np.empty(size, dtype=floatX)
+        setattr(_read_buffers, key, buf)
+    return buf[:size].reshape(shape)
+
+
 class WarpingOOBError(ValueError):
     """Raised when transformed coordinates are refer to out-of-bounds areas.
 
@@ -305,6 +535,8 @@ def warp_slice(
         target_src: Optional[DataSource] = None,
         target_patch_shape: Optional[Union[Tuple[int], np.ndarray]] = None,
         target_discrete_ix: Optional[Sequence[int]] = None,
+        M_inv: Optional[np.ndarray] = None,
+        is_projective: Optional[bool] = None,
         debug: bool = False
 ) -> Tuple[np.ndarray, Optional[np.ndarray]]:
     """
@@ -345,6 +577,16 @@ def warp_slice(
         be used for reading target data:
         - discrete targets are obtained by nearest-neighbor interpolation
         - non-discrete (continuous) targets are linearly interpolated.
+    M_inv
+        Optional precomputed inverse of ``M`` (see
+        ``get_warped_coord_transform(..., return_inverse=True)``).
+        It is cast to ``floatX`` if it has a different dtype.
+        If ``None`` (default), it is computed here by matrix inversion.
+    is_projective
+        Whether ``M`` is a projective (perspective) transform, i.e. whether
+        a homogeneous divide is necessary. If ``None`` (default), this is
+        determined by checking ``M[3, :3]``.
+        Passing ``True`` for an affine ``M`` is safe, but slower.
     debug: If ``True`` (default), enable additional sanity checks to catch
         warping issues early.
 
@@ -368,23 +610,40 @@ def warp_slice(
     # Spatial shapes of input and target data sources
     inp_src_shape = np.array(inp_src.shape[-3:])
 
-    M_inv = np.linalg.inv(M.astype(np.float64)).astype(floatX) # stability...
+    if M_inv is None:
+        M_inv = _inv4x4(M.astype(np.float64).tobytes())
+    else:
+        M_inv = np.asarray(M_inv, dtype=floatX)
+    if is_projective is None:
+        is_projective = bool(np.any(M[3, :3] != 0))
     dest_corners = make_dest_corners(patch_shape)
-    src_corners = np.dot(M_inv, dest_corners.T).T
-    if np.any(M[3,:3] != 0): # homogeneous divide
+    src_corners = np.matmul(dest_corners, M_inv.T)
+    if is_projective: # homogeneous divide
         src_corners /= src_corners[:,3][:,None]
 
     # check corners
+    # This is done before computing the dense coordinates, so random
+    #  transforms that leave the source bounds are rejected as early as possible.
     src_corners = src_corners[:,:3]
-    lo = np.min(np.floor(src_corners), 0).astype(np.int)
-    hi = np.max(np.ceil(src_corners + 1), 0).astype(np.int)
+    lo = np.floor(src_corners.min(0)).astype(np.int64)
+    hi = np.ceil(src_corners.max(0) + 1).astype(np.int64)
+    if lo.min() < 0 or np.any(hi >= inp_src_shape - 1):
+        raise WarpingOOBError("Out of bounds for inp_src")
+
     # compute/transform dense coords
-    dest_coords = make_dest_coords(patch_shape)
-    src_coords = np.tensordot(dest_coords, M_inv, axes=[[-1], [1]])
-    if np.any(M[3, :3] != 0):  # homogeneous divide
-        src_coords /= src_coords[..., 3][..., None]
-    # cut patch
-    src_coords = src_coords[..., :3]
+    if is_projective:
+        dest_coords = make_dest_coords(patch_shape)
+        # Flatten the spatial axes so this is a single (N, 4) x (4, 4) GEMM
+        src_coords = np.matmul(dest_coords.reshape(-1, 4), M_inv.T).reshape(dest_coords.shape)
+        src_coords /= src_coords[..., 3][..., None]  # homogeneous divide
+        # cut patch
+        src_coords = src_coords[..., :3]
+    else:
+        # Affine transform: The homogeneous coordinate is always 1, so we can
+        #  skip it and just apply the linear part and add the translation.
+        dest_coords = make_dest_coords_3d(patch_shape)
+        src_coords = np.einsum('ij,jzyx->zyxi', M_inv[:3, :3], dest_coords)
+        src_coords += M_inv[:3, 3]
 
     # TODO: WIP code, integrate this into the warping pipeline with config options
     # Perform elastic deformation on warped coordinates so we don't have
@@ -432,17 +691,15 @@ def warp_slice(
             target_offset[2]:(target_offset[2] + target_patch_shape[2])
         ]
         # shift coords to be w.r.t. to origin of target_src array
-        lo_targ = np.floor(src_coords_target.min(2).min(1).min(0) - target_src_offset).astype(np.int)
-        hi_targ = np.ceil(src_coords_target.max(2).max(1).max(0) + 1 - target_src_offset).astype(np.int)
-        if np.any(lo_targ < 0) or np.any(hi_targ >= target_src_shape - 1):
+        lo_targ = np.floor(src_coords_target.min(axis=(0, 1, 2)) - target_src_offset).astype(np.int64)
+        hi_targ = np.ceil(src_coords_target.max(axis=(0, 1, 2)) + 1 - target_src_offset).astype(np.int64)
+        if lo_targ.min() < 0 or np.any(hi_targ >= target_src_shape - 1):
             raise WarpingOOBError("Out of bounds for target_src")
 
-    if np.any(lo < 0) or np.any(hi >= inp_src_shape - 1):
-        raise WarpingOOBError("Out of bounds for inp_src")
-
     # Slice and interpolate input
     # Slice to hi + 1 because interpolation potentially needs this value.
-    img_cut = slice_3d(inp_src, lo, hi + 1, dtype=floatX)
+    img_cut = _read_buffer('inp', inp_src.shape[:-3] + tuple(hi + 1 - lo))
+    img_cut = slice_3d(inp_src, lo, hi + 1, out=img_cut)
     if img_cut.ndim == 3:
         img_cut = img_cut[None]
     inp = np.zeros((n_f,) + patch_shape, dtype=floatX)
@@ -453,15 +710,36 @@ def warp_slice(
     if debug and np.any((src_coords - lo).min(2).min(1).min(0) < 0):
         raise WarpingSanityError(f'src_coords check failed (negative indices).\n{(src_coords - lo).min(2).min(1).min(0)}')
 
-    for k in range(n_f):
-        map_coordinates_linear(img_cut[k], src_coords, lo, inp[k])
+    if np.prod(patch_shape) >= PARALLEL_MIN_VOXELS:
+        interp_linear = map_coordinates_linear
+    else:
+        interp_linear = _map_coordinates_linear_serial
+    if cv2 is None or is_projective:
+        src_z = None
+    else:
+        src_z = _slicewise_src_z(M_inv, src_coords, lo)
+    if src_z is not None:
+        # Each output plane is read from a single source plane, so we can use
+        #  OpenCV's SIMD-optimized 2D remapping instead of 3D interpolation.
+        for z, zs in enumerate(src_z):
+            map_x = (src_coords[z, :, :, 2] - lo[2]).astype(np.float32, copy=False)
+            map_y = (src_coords[z, :, :, 1] - lo[1]).astype(np.float32, copy=False)
+            for k in range(n_f):
+                inp[k, z] = cv2.remap(
+                    img_cut[k, zs], map_x, map_y, cv2.INTER_LINEAR,
+                    borderMode=cv2.BORDER_REPLICATE
+                )
+    else:
+        # All input channels are interpolated in one pass (see map_coordinates_linear())
+        interp_linear(img_cut, src_coords, lo, inp.transpose(1, 2, 3, 0))
 
     # Slice and interpolate target
     if target_src is not None:
         # dtype is float as well here because of the static typing of the
         # numba-compiled map_coordinates functions
         # Slice to hi + 1 because interpolation potentially needs this value.
-        target_cut = slice_3d(target_src, lo_targ, hi_targ + 1, dtype=floatX)
+        target_cut = _read_buffer('target', target_src.shape[:-3] + tuple(hi_targ + 1 - lo_targ))
+        target_cut = slice_3d(target_src, lo_targ, hi_targ + 1, out=target_cut)
         if target_cut.ndim == 3:
             target_cut = target_cut[None]
         src_coords_target = np.ascontiguousarray(src_coords_target, dtype=floatX)
@@ -471,33 +749,36 @@ def warp_slice(
             target_discrete_ix = [True for i in range(n_f_t)]
         else:
             target_discrete_ix = [i in target_discrete_ix for i in range(n_f_t)]
+        discrete_mask = np.array(target_discrete_ix, dtype=bool)
 
         if debug and np.any((src_coords_target - lo_targ).max(2).max(1).max(0) >= target_cut.shape[-3:]):
             raise WarpingSanityError(f'src_coords_target check failed (too high).\n{(src_coords_target - lo_targ).max(2).max(1).max(0)}\n{target_cut.shape[-3:]}')
         if debug and np.any((src_coords_target - lo_targ).min(2).min(1).min(0) < 0):
             raise WarpingSanityError(f'src_coords_target check failed (negative indices).\n{(src_coords_target - lo_targ).min(2).min(1).min(0)}')
 
-        for k, discr in enumerate(target_discrete_ix):
-            if discr:
-                map_coordinates_nearest(target_cut[k], src_coords_target, lo_targ, target[k])
-
-                if debug:
-                    unique_cut = set(list(np.unique(target_cut[k])))
-                    unique_warp = set(list(np.unique(target[k])))
-                    # If new values appear in discrete targets, there is something wrong.
-                    # unique_warp can have less values than unique_cut though, for example
-                    #  if the warping transform coincidentally slices away all values of a class.
-                    if not unique_warp.issubset(unique_cut):
-                        print(
-                            f'Invalid target encountered:\n\nunique_cut=\n{unique_cut}\n'
-                            f'unique_warp=\n{unique_warp}\nM_inv=\n{M_inv}\n'
-                            f'src_coords_target - lo_targ=\n{src_coords_target - lo_targ}\n'
-                        )
-                        # Try dropping to an IPython shell (Won't work with num_workers > 0).
-                        import IPython; IPython.embed(); raise SystemExit
-
-            else:
-                map_coordinates_linear(target_cut[k], src_coords_target, lo_targ, target[k])
+        if np.prod(target_patch_shape) >= PARALLEL_MIN_VOXELS:
+            interp_mixed = map_coordinates_mixed
+        else:
+            interp_mixed = _map_coordinates_mixed_serial
+        # All target channels are interpolated in one pass, each with the
+        #  interpolation method that is appropriate for it.
+        interp_mixed(target_cut, src_coords_target, lo_targ, discrete_mask, target.transpose(1, 2, 3, 0))
+
+        if debug:
+            for k in np.flatnonzero(discrete_mask):
+                unique_cut = set(list(np.unique(target_cut[k])))
+                unique_warp = set(list(np.unique(target[k])))
+                # If new values appear in discrete targets, there is something wrong.
+                # unique_warp can have less values than unique_cut though, for example
+                #  if the warping transform coincidentally slices away all values of a class.
+                if not unique_warp.issubset(unique_cut):
+                    print(
+                        f'Invalid target encountered:\n\nunique_cut=\n{unique_cut}\n'
+                        f'unique_warp=\n{unique_warp}\nM_inv=\n{M_inv}\n'
+                        f'src_coords_target - lo_targ=\n{src_coords_target - lo_targ}\n'
+                    )
+                    # Try dropping to an IPython shell (Won't work with num_workers > 0).
+                    import IPython; IPython.embed(); raise SystemExit
 
     else:
         target = None
@@ -521,7 +802,8 @@ def get_warped_coord_transform(
         perspective: bool = False,
         target_src_shape: Optional[Union[Tuple, np.ndarray]] = None,
         target_patch_shape: Optional[Union[Tuple, np.ndarray]] = None,
-) -> np.ndarray:
+        return_inverse: bool = False,
+) -> Union[np.ndarray, Tuple[np.ndarray, np.ndarray]]:
     """
     Generates the warping transformation parameters and composes them into a
     single 4D homogeneous transformation matrix ``M``.
@@ -554,11 +836,18 @@ def get_warped_coord_transform(
         Target data source shape
     target_patch_shape
         Target patch shape
+    return_inverse
+        If ``True``, additionally return the inverse of ``M``, which is
+        composed from the inverses of the individual transformations
+        instead of inverting ``M`` as a whole.
+        It can be passed to ``warp_slice()`` to skip the matrix inversion there.
 
     Returns
     -------
     M
         Coordinate transformation matrix.
+    M_inv
+        Inverse of ``M`` (only if ``return_inverse=True``).
     """
 
     patch_shape = np.array(patch_shape)
@@ -601,11 +890,13 @@ def get_warped_coord_transform(
     x = np.random.randint(lo_pos[2], hi_pos[2]) + src_remainder[2]
 
     # Generate coordinate transformation matrices that express the region
-    F = get_random_flipmat(no_x_flip)
+    # Flips and swaps are not expressed as matrices, but as axis signs and
+    #  permutations, which are directly applied by flip_swap()/flip_swap_inv().
+    flips = get_random_flips(no_x_flip)
     if no_x_flip:
-        S = np.eye(4, dtype=floatX)
+        perm = np.arange(3)
     else:
-        S = get_random_swapmat(lock_z)
+        perm = get_random_swap(lock_z)
 
     if np.isclose(warp_amount, 0):
         R = np.eye(4, dtype=floatX)
@@ -620,16 +911,24 @@ def get_warped_coord_transform(
     T_src = translate(-z, -y, -x)
     S_src = scale(aniso_factor, 1, 1)
 
-    if sample_aniso:
-        S_dest = scale(1.0 / aniso_factor, 1, 1)
-    else:
-        S_dest = identity()
-    T_dest = translate(dest_center[0], dest_center[1], dest_center[2])
+    # Constant T_dest @ S_dest (destination translation and anisotropic scaling)
+    TS_dest, TS_dest_inv = _dest_transform(
+        tuple(dest_center.tolist()), aniso_factor, sample_aniso
+    )
 
     # Reduce all transformations into a single matrix M by applying consecutive
     #  matrix multiplications. Applying M to a homogeneous coordinate vector
     #  is mathematically equivalent to consecutively applying each matrix to it.
     #  See https://en.wikipedia.org/wiki/Transformation_matrix#Composing_and_inverting_transformations
-    M = chain_matrices([T_dest, S_dest, R, W, F, S, S_src, T_src])
-
-    return M
+    M = TS_dest @ R @ W @ flip_swap(S_src @ T_src, flips, perm)
+    if not return_inverse:
+        return M
+
+    # The inverse of a product is the product of the inverses in reverse order.
+    #  Rotations, flips and swaps are orthogonal, so their inverses are just
+    #  their transposes, and translations and scalings are trivially inverted.
+    #  Only the random warping matrix W requires an actual matrix inversion.
+    W_inv = _inv4x4(W.astype(np.float64).tobytes())
+    M_inv = translate(z, y, x) @ scale_inv(aniso_factor, 1, 1) @ flip_swap_inv(W_inv @ R.T @ TS_dest_inv, flips, perm)
+
+    return M, M_inv
@@ -7,7 +7,7 @@
 # Authors: Martin Drawitsch
 
 import os
-from typing import Union, Any, Sequence
+from typing import Union, Any, Sequence, Optional
 
 import h5py
 import numpy as np
@@ -61,6 +61,21 @@ class HDF5DataSource(DataSource):
             h5data = f[self.key]
             return h5data[idx]
 
+    # Has to be wrapped manually because the dataset has to stay open during the read
+    def read_direct(self, dest: np.ndarray, source_sel=None, dest_sel=None) -> None:
+        """Reads data directly into the existing array ``dest``
+        (see ``h5py.Dataset.read_direct()``)."""
+        if self.in_memory:
+            source = self._data if source_sel is None else self._data[source_sel]
+            if dest_sel is None:
+                dest[...] = source
+            else:
+                dest[dest_sel] = source
+            return
+        with h5py.File(self.fname, 'r') as f:
+            h5data = f[self.key]
+            h5data.read_direct(dest, source_sel, dest_sel)
+
 
 def slice_3d(
         src: DataSource,
@@ -69,6 +84,7 @@ def slice_3d(
         dtype: type = np.float32,
         prepend_empty_axis: bool = False,
         check_bounds=True,
+        out: Optional[np.ndarray] = None,
 ) -> np.ndarray:
     """ Slice a patch of 3D image data out of a data source.
 
@@ -87,6 +103,11 @@ def slice_3d(
             bounds of ``src`` will be allowed (no negative indices or slices
             to indices that exceed the shape of ``src``, which would normally
             just be ignored).
+        out: Optional pre-allocated C-contiguous array with the sliced shape
+            into which the data is read. If ``src`` supports ``read_direct()``
+            (like ``h5py.Dataset`` and ``HDF5DataSource``), the data is
+            read (and converted to ``out.dtype``) without intermediate copies.
+            ``dtype`` is ignored if ``out`` is given.
 
     Returns:
         Sliced image array.
@@ -105,21 +126,28 @@ def slice_3d(
     ## cut = srcv[full_slice]
 
     if src.ndim == 4:
-        cut = src[
+        sel = np.s_[
             :,
             coords_lo[0]:coords_hi[0],
             coords_lo[1]:coords_hi[1],
             coords_lo[2]:coords_hi[2]
         ]
     elif src.ndim == 3:
-        cut = src[
+        sel = np.s_[
             coords_lo[0]:coords_hi[0],
             coords_lo[1]:coords_hi[1],
             coords_lo[2]:coords_hi[2]
         ]
     else:
         raise ValueError(f'Expected src.ndim to be 3 or 4, but got {src.ndim} instead.')
+    if out is not None:
+        if hasattr(src, 'read_direct'):
+            src.read_direct(out, sel)
+        else:
+            out[...] = src[sel]
+        cut = out
+    else:
+        cut = src[sel].astype(dtype, copy=False)
     if prepend_empty_axis:
         cut = cut[None]
-    cut = cut.astype(dtype, copy=False)
     return cut
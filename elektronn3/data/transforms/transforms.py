@@ -18,6 +18,7 @@ torchvision.transforms, but there are two key differences:
 
 from typing import Sequence, Tuple, Optional, Dict, Any, Callable, Union
 
+import numba
 import numpy as np
 import skimage.exposure
 import skimage.transform
@@ -470,6 +471,16 @@ class RandomGammaCorrection:
         return gcorr, target
 
 
+@numba.njit(parallel=True, fastmath=True, cache=True)
+def _gray_augment_inplace(x, alpha, beta, gamma):
+    """Computes ``x = clip(x * alpha + beta, 0, 1) ** gamma`` in-place and in a
+    single pass over the flat array ``x``."""
+    for i in numba.prange(x.size):
+        v = x[i] * alpha + beta
+        v = min(max(v, 0.0), 1.0)
+        x[i] = v ** gamma
+
+
 # TODO: The current necessity of intensity rescaling for normalized
 #       (zero mean, unit std) inputs is really uncool. Can we circumvent this?
 class RandomGrayAugment:
@@ -528,9 +539,9 @@ class RandomGrayAugment:
         beta = (np.random.rand(nc) - 0.5) * 0.3  # Mediates whether values are clipped for shadows or lights
         gamma = 2.0 ** (np.random.rand(nc) * 2 - 1)  # Sample from [0.5, 2]
 
-        aug[channels] = aug[channels] * alpha[:, None, None] + beta[:, None, None]
-        aug[channels] = np.clip(aug[channels], 0, 1)
-        aug[channels] = aug[channels] ** gamma[:, None, None]
+        for i, c in enumerate(channels):
+            # aug is a fresh C-contiguous copy, so reshape(-1) returns a view.
+            _gray_augment_inplace(aug[c].reshape(-1), alpha[i], beta[i], gamma[i])
 
         for c in channels:  # Rescale to original (normalized) intensity range
             aug[c] = skimage.exposure.rescale_intensity(aug[c], out_range=orig_intensity_ranges[c])